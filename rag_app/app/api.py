@@ -1,44 +1,119 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import hashlib
+import os
 from pathlib import Path
-from typing import List
+import re
+import time
+from typing import AsyncIterator, List, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.faiss_store import FaissStore
-from app.llm import call_llm
+from app.http_client import http_client
+from app.llm import call_llm, warm_llm_connection
 
 
 ROOT = Path(__file__).resolve().parents[1]
 
-app = FastAPI()
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))     # seconds
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "10000"))  # entries
+
+
+#Loads FAISS index + metadata ONCE per process (not per request)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.store = FaissStore(ROOT)
+    # Final-answer TTL cache: sha256(normalized query) -> (expires_at, answer)
+    app.state.answer_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+    # Open a pooled OpenRouter connection in the background (doesn't delay startup);
+    # the long keep-alive expiry of the shared pool keeps it open between requests
+    warm_task = asyncio.create_task(warm_llm_connection())
+    yield
+    warm_task.cancel()
+    await http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 class QueryRequest(BaseModel):
     query: str
 
 
+#Formats text as one Server-Sent Event (multi-line text -> multiple data lines;
+#SSE treats \r\n, \r and \n all as line ends)
+def _sse(text: str, event: str = "") -> str:
+    lines = "".join(f"data: {line}\n" for line in re.split(r"\r\n|\r|\n", text))
+    return (f"event: {event}\n" if event else "") + lines + "\n"
+
+
 @app.post("/chat")
-def chat(req: QueryRequest):
+async def chat(
+    req: QueryRequest, request: Request, nocache: bool = False
+) -> StreamingResponse:
     q = (req.query or "").strip()
     if not q:
         raise HTTPException(status_code=400, detail="query must be a non-empty string")
 
-    try:
-        store = FaissStore(ROOT)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"failed to load vector store: {e}")
+    store: FaissStore = request.app.state.store
+    answer_cache = request.app.state.answer_cache
+
+    # Serve repeated (FAQ-like) queries from the answer cache; ?nocache=1 bypasses it
+    # entirely (no read, no write)
+    cache_key = hashlib.sha256(q.lower().encode("utf-8")).hexdigest()
+    if not nocache:
+        cached = answer_cache.get(cache_key)
+        if cached is not None and cached[0] > time.monotonic():
+            answer_cache.move_to_end(cache_key)
+            return StreamingResponse(
+                iter([_sse(cached[1])]),
+                media_type="text/event-stream",
+                headers={"X-Cache": "HIT", "X-Cache-Key": cache_key},
+            )
 
     # Retrieve top-k chunks (k=5)
     try:
-        results = store.similarity_search(q, k=5)
+        results = await store.similarity_search(q, k=5)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"retrieval error: {e}")
 
     contexts: List[str] = [t for t, _ in results]
 
+    # Wait for the first token before responding so request/auth errors still return 502
+    tokens = call_llm(q, contexts)
     try:
-        answer = call_llm(q, contexts)
+        first = await anext(tokens, "")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"LLM error: {e}")
 
-    return {"answer": answer}
\ No newline at end of file
+    async def event_stream() -> AsyncIterator[str]:
+        parts = [first]
+        if first:
+            yield _sse(first)
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield _sse(token)
+        except Exception as e:
+            # Headers are already sent: report the failure in-stream and skip caching
+            yield _sse(f"LLM error: {e}", event="error")
+            return
+
+        answer = "".join(parts)
+        if not answer or nocache:
+            return  # Never cache an empty completion; ?nocache=1 leaves the cache untouched
+
+        answer_cache[cache_key] = (time.monotonic() + ANSWER_CACHE_TTL, answer)
+        answer_cache.move_to_end(cache_key)
+        if len(answer_cache) > ANSWER_CACHE_SIZE:
+            answer_cache.popitem(last=False)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"X-Cache": "BYPASS" if nocache else "MISS", "X-Cache-Key": cache_key},
+    )
\ No newline at end of file
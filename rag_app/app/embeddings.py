@@ -1,17 +1,25 @@
 from typing import List
+import asyncio
+import mmap
 import re
+import faiss
 import numpy as np
-from openai import OpenAI
+from openai import AsyncOpenAI
 import os
 from dotenv import load_dotenv
 
+from app.http_client import http_client
+
 # Load environment variables
 load_dotenv()
 
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "google/gemini-embedding-001")
+
 # Initialize OpenAI client for OpenRouter
-client = OpenAI(
+client = AsyncOpenAI(
     base_url="https://openrouter.ai/api/v1",
     api_key=os.getenv("OPENROUTER_API_KEY"),
+    http_client=http_client,
 )
 
 
@@ -25,70 +33,107 @@ def load_and_chunk_text(file_path: str) -> List[str]:
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "200"))  # words
     OVERLAP = int(os.getenv("CHUNK_OVERLAP", "40"))   # words overlap for continuity
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        text = f.read()
+    STEP = CHUNK_SIZE - OVERLAP
 
-    text = re.sub(r"\s+", " ", text).strip()
-    if not text:
-        return []
+    chunks: List[str] = []
+    window: List[str] = []  # Words of the chunk currently being built
 
-    words = text.split()
-    chunks = []
+    # Stream words straight from a memory-mapped file: peak memory is one chunk's
+    # worth of words, not the whole corpus
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []  # mmap cannot map an empty file
 
-    start = 0
-    while start < len(words):
-        end = start + CHUNK_SIZE
-        chunk_words = words[start:end]
-        chunk = " ".join(chunk_words).strip()
-        if chunk:
-            chunks.append(chunk)
-        start += CHUNK_SIZE - OVERLAP
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for m in re.finditer(rb"\S+", mm):
+                # ASCII whitespace never occurs inside a UTF-8 sequence, so each token
+                # decodes cleanly; split() also breaks on non-ASCII whitespace
+                window.extend(m.group().decode("utf-8").split())
+                while len(window) >= CHUNK_SIZE:
+                    chunks.append(" ".join(window[:CHUNK_SIZE]))
+                    del window[:STEP]
+
+    # Trailing (shorter) chunks, one per remaining step
+    while window:
+        chunks.append(" ".join(window))
+        del window[:STEP]
 
     return chunks
 
+#Single API round-trip for one batch of texts
+async def _embed_batch(texts: List[str]) -> np.ndarray:
+    embedding_response = await client.embeddings.create(
+        extra_headers={
+            "HTTP-Referer": os.getenv("SITE_URL", ""),
+            "X-Title": os.getenv("SITE_NAME", ""),
+        },
+        model=EMBEDDING_MODEL,
+        input=texts,
+        encoding_format="float"
+    )
+
+    # Extract embeddings from response
+    embeddings = [data.embedding for data in embedding_response.data]
+    if len(embeddings) != len(texts):
+        raise RuntimeError(
+            f"embedding API returned {len(embeddings)} vectors for {len(texts)} inputs"
+        )
+    return np.asarray(embeddings, dtype=np.float32)
+
 #CHUNKS TO VECTORS + NORMALISED
-def embed_texts(texts: List[str]) -> np.ndarray:
+async def embed_texts(texts: List[str]) -> np.ndarray:
     """
     Embed a list of texts using OpenRouter's embedding API.
     
     - Uses google/gemini-embedding-001
-    - Supports batch processing
+    - Splits input into batches sent concurrently (bounded by a semaphore)
     - Returns normalized embeddings compatible with FAISS
     """
 
     if not texts:
         return np.array([])
-    
+
+    BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "96"))        # inputs per request
+    CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "5"))       # requests in flight
+
+    batches = [texts[i:i + BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def sem_embed(batch: List[str]) -> np.ndarray:
+        async with sem:
+            return await _embed_batch(batch)
+
     try:
-        embedding_response = client.embeddings.create(
-            extra_headers={
-                "HTTP-Referer": os.getenv("SITE_URL", ""),
-                "X-Title": os.getenv("SITE_NAME", ""),
-            },
-            model=os.getenv("EMBEDDING_MODEL", "google/gemini-embedding-001"),
-            input=texts,  # Batch processing supported
-            encoding_format="float"
-        )
-        
-        # Extract embeddings from response
-        embeddings = [data.embedding for data in embedding_response.data]
-        embeddings_array = np.asarray(embeddings, dtype=np.float32)
+        results = await asyncio.gather(*[sem_embed(b) for b in batches])
+
+        # Reassemble batches in original order
+        embeddings_array = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        for idx, batch_emb in enumerate(results):
+            embeddings_array[idx * BATCH_SIZE: idx * BATCH_SIZE + len(batch_emb)] = batch_emb
         
-        # Normalize embeddings for cosine similarity (FAISS compatibility)
-        # Value between 0 to 1 for better conclusions
-        norms = np.linalg.norm(embeddings_array, axis=1, keepdims=True)
-        normalized_embeddings = embeddings_array / norms
+        # Normalize embeddings in place (unit vectors: inner product == cosine similarity)
+        faiss.normalize_L2(embeddings_array)
         
-        return normalized_embeddings
+        return embeddings_array
     
     except Exception as e:
         print(f"Error creating embeddings: {str(e)}")
         return np.array([])
 
 #Single Query Embedder (User)
-def embed_single_text(text: str) -> np.ndarray:
+async def embed_query(text: str) -> np.ndarray:
     """
-    Embed a single text string.
-    Convenience function for single queries.
+    Embed a single query string.
+    Returns a normalized (1, d) float32 array, the shape FAISS search expects.
     """
-    return embed_texts([text])[0] if text else np.array([])
\ No newline at end of file
+    if not text:
+        return np.array([])
+
+    try:
+        query_emb = await _embed_batch([text])
+        faiss.normalize_L2(query_emb)
+        return query_emb
+
+    except Exception as e:
+        print(f"Error creating embeddings: {str(e)}")
+        return np.array([])
\ No newline at end of file
@@ -1,13 +1,15 @@
 """FAISS index loading and similarity search utilities."""
 
+import asyncio
+from collections import OrderedDict
+import os
 from pathlib import Path
-import pickle
 from typing import List, Tuple
 
 import numpy as np
 import faiss
 
-from app.embeddings import embed_texts
+from app.embeddings import embed_query
 
 
 class FaissStore:
@@ -17,7 +19,7 @@ class FaissStore:
     Responsibilities:
     - Load FAISS index from disk
     - Load associated metadata (text chunks)
-    - Embed query text
+    - Embed query text (LRU-cached per normalized query)
     - Perform top-K similarity search
     """
     #Loads FAISS index + METADATA
@@ -25,29 +27,72 @@ class FaissStore:
         embeddings_dir = root_dir / "embeddings"
 
         index_path = embeddings_dir / "faiss_index.bin"
-        metadata_path = embeddings_dir / "metadata.pkl"
+        metadata_path = embeddings_dir / "metadata.npz"
 
         if not index_path.exists():
             raise FileNotFoundError(f"FAISS index not found: {index_path}")
         if not metadata_path.exists():
             raise FileNotFoundError(f"Metadata file not found: {metadata_path}")
 
-        # Load FAISS index
-        self.index = faiss.read_index(str(index_path))
+        # Load FAISS index (memory-mapped, read-only: pages are shared across
+        # worker processes through the OS page cache instead of copied per process).
+        # IO_FLAG_MMAP_IFC maps flat/HNSW/SQ storage; IO_FLAG_MMAP only covers IVF lists.
+        self.index = faiss.read_index(
+            str(index_path), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+        )
 
-        # Load metadata (chunks)
-        with open(metadata_path, "rb") as f:
-            self.chunks: List[str] = pickle.load(f)
+        # HNSW search breadth (recall vs latency); older flat indexes have no graph
+        if hasattr(self.index, "hnsw"):
+            self.index.hnsw.efSearch = 64
+
+        # Load metadata (chunks): one UTF-8 buffer + offsets, decoded on access
+        with np.load(metadata_path) as metadata:
+            self._buf: bytes = metadata["buf"].tobytes()
+            self._off: np.ndarray = metadata["off"]
 
         # Sanity check
-        if self.index.ntotal != len(self.chunks):
+        if self.index.ntotal != len(self):
             raise RuntimeError(
                 "FAISS index size does not match metadata size "
-                f"({self.index.ntotal} vs {len(self.chunks)})"
+                f"({self.index.ntotal} vs {len(self)})"
             )
 
+        # Query embedding LRU cache (normalized query -> (1, d) float32 embedding)
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+        self.query_cache_hits = 0
+        self.query_cache_misses = 0
+
+    #Chunk text lookup by FAISS id
+    def __getitem__(self, i: int) -> str:
+        return self._buf[self._off[i]:self._off[i + 1]].decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._off) - 1
+
+    #Query Embedder with LRU cache - skips the embedding API call on repeated queries
+    async def _embed_query_cached(self, query: str) -> np.ndarray:
+        key = query.strip().lower()
+
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            self._query_cache.move_to_end(key)
+            self.query_cache_hits += 1
+            return cached
+
+        self.query_cache_misses += 1
+        query_emb = await embed_query(query) #embeddings.py function call
+
+        # Only cache successful embeddings (embed_query returns an empty array on error)
+        if query_emb.shape == (1, self.index.d):
+            self._query_cache[key] = query_emb
+            if len(self._query_cache) > self._query_cache_size:
+                self._query_cache.popitem(last=False)
+
+        return query_emb
+
     #Similarity Search - Embedding User Query + FAISS Search
-    def similarity_search(
+    async def similarity_search(
         self, query: str, k: int = 3
     ) -> List[Tuple[str, float]]:
         """
@@ -58,26 +103,29 @@ class FaissStore:
             k: Number of results to return
 
         Returns:
-            List of (chunk_text, distance) tuples
+            List of (chunk_text, score) tuples (cosine similarity, higher is better)
         """
         if not query.strip():
             return []
 
         # Embed query
-        query_emb = embed_texts([query]) #embeddings.py function call
-        if not isinstance(query_emb, np.ndarray):
-            raise RuntimeError("embed_texts must return a NumPy array")
-        if query_emb.dtype != np.float32:
-            query_emb = query_emb.astype(np.float32)
-
-        # FAISS search
-        distances, indices = self.index.search(query_emb, k)
-
-        results: List[Tuple[str, float]] = [] #List of (chunk_text, distance) tuples
-        for idx, dist in zip(indices[0], distances[0]):
-            if idx < 0:
-                continue
-            results.append((self.chunks[idx], float(dist)))
+        query_emb = await self._embed_query_cached(query)
+        if query_emb.shape != (1, self.index.d):
+            raise RuntimeError(
+                f"query embedding failed (got shape {query_emb.shape}, "
+                f"expected (1, {self.index.d}))"
+            )
+
+        # FAISS search (CPU-bound, run off the event loop); embed_query already returns
+        # a C-contiguous (1, d) float32 array, so it is passed without a copy
+        scores, indices = await asyncio.to_thread(self.index.search, query_emb, k)
+
+        # tolist() converts to Python ints/floats in one C call instead of per-element
+        results: List[Tuple[str, float]] = [ #List of (chunk_text, score) tuples
+            (self[idx], score)
+            for idx, score in zip(indices[0].tolist(), scores[0].tolist())
+            if idx >= 0
+        ]
 
         return results #Top 5 Results 
         
@@ -0,0 +1,20 @@
+"""Shared HTTP connection pool for all OpenRouter calls (embeddings + LLM)."""
+
+import importlib.util
+import os
+
+import httpx
+
+# One pool for the whole process so connections opened by the embedding call are
+# reused by the LLM call (HTTP/2 is enabled only when the optional `h2` package is installed).
+# Idle connections are kept for HTTP_KEEPALIVE_EXPIRY seconds (httpx defaults to 5) so the
+# pool stays warm between requests.
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=1000,
+        max_keepalive_connections=1000,
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "90")),
+    ),
+    timeout=httpx.Timeout(60.0, connect=5.0),
+    http2=importlib.util.find_spec("h2") is not None,
+)
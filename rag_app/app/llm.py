@@ -1,18 +1,33 @@
-from typing import List
-from openai import OpenAI
+from typing import AsyncIterator, List
+from openai import AsyncOpenAI
 import os
 
+from app.http_client import http_client
+
 # Initialize the OpenAI client with OpenRouter
-client = OpenAI(
+client = AsyncOpenAI(
     base_url="https://openrouter.ai/api/v1",
     api_key=os.getenv("OPENROUTER_API_KEY"),  # Store API key in environment variable
+    http_client=http_client,
 )
 
-#COMBINES CONTEXTS + CONSTRUCT PROMPT + CALL LLM
-def call_llm(query: str, contexts: List[str]) -> str:
+#WARMS UP A POOLED CONNECTION TO OPENROUTER (TCP + TLS) AT STARTUP
+async def warm_llm_connection() -> None:
+    """
+    Best-effort no-op request so the first /chat call can reuse an open connection.
+    Errors are ignored; the real LLM call reports any connectivity problem.
+    """
+    try:
+        await http_client.head(str(client.base_url), timeout=5.0)
+    except Exception:
+        pass
+
+#COMBINES CONTEXTS + CONSTRUCT PROMPT + CALL LLM (STREAMED)
+async def call_llm(query: str, contexts: List[str]) -> AsyncIterator[str]:
     """
     OpenRouter API LLM call using google/gemini-2.5-flash model.
     Uses provided contexts to answer the question.
+    Streams the answer, yielding text deltas as the model produces them.
     """
 
 #Combines contexts into single string
@@ -29,21 +44,20 @@ Question:
 
 Answer:"""
     
-#CALLS OPENROUTER MODEL   
-    try:
-        completion = client.chat.completions.create(
-            model="google/gemini-2.5-flash", 
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            max_tokens=300,
-            temperature=0,  # For consistent, deterministic responses
-        )
-        
-        return completion.choices[0].message.content
+#CALLS OPENROUTER MODEL (errors propagate so the API returns 502 and never caches them)
+    stream = await client.chat.completions.create(
+        model="google/gemini-2.5-flash", 
+        messages=[
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        max_tokens=300,
+        temperature=0,  # For consistent, deterministic responses
+        stream=True,
+    )
     
-    except Exception as e:
-        return f"Error calling LLM: {str(e)}"
\ No newline at end of file
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""Gunicorn settings for serving the API with multiple Uvicorn workers.
+
+Usage (from the rag_app directory):
+  gunicorn app.api:app -c gunicorn_conf.py
+
+Each worker is a separate process, so FAISS searches run in parallel instead of
+contending for one GIL. The app is not preloaded: `FaissStore` is created in
+each worker's lifespan (after fork), every worker memory-maps the index on its
+own and the kernel shares the underlying page-cache pages between them.
+
+Uvicorn workers are async, so OpenRouter I/O does not need extra processes; one
+worker per core covers the CPU-bound search. Each worker's FAISS is limited to a
+single OpenMP thread so workers x cores threads don't oversubscribe the CPU.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"  # Uses uvloop + httptools when installed
+preload_app = False
+
+
+def post_fork(server, worker):
+    # Runs before the worker imports the app (and FAISS / OpenMP)
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
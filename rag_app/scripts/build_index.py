@@ -8,14 +8,21 @@ Usage:
 
 What it does:
   - Loads chunks via `load_and_chunk_text` from `../data/inextlabs.txt`.
-  - Generates embeddings with `embed_texts`.
-  - Builds a FAISS IndexFlatL2 and adds embeddings.
-  - Saves `embeddings/faiss_index.bin` and `embeddings/metadata.pkl`.
+  - Generates embeddings with `embed_texts`, reusing vectors cached in
+    `embeddings/embed_cache.sqlite` for chunks that were already embedded.
+  - Builds a FAISS IndexHNSWSQ (8-bit scalar-quantized vectors, inner product /
+    cosine similarity), trains the quantizer and adds embeddings.
+  - Saves `embeddings/faiss_index.bin` and `embeddings/metadata.npz` (all chunk
+    text as one UTF-8 buffer plus int64 offsets).
 """
+import asyncio
+from contextlib import closing
+import hashlib
 from pathlib import Path
+import sqlite3
 import sys
-import pickle
 import os
+from typing import List
 
 import numpy as np
 import faiss
@@ -24,7 +31,56 @@ import faiss
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 
-from app.embeddings import load_and_chunk_text, embed_texts
+from app.embeddings import EMBEDDING_MODEL, load_and_chunk_text, embed_texts
+
+
+#EMBEDDING CACHE (SHA-256(model:text) -> float32 VECTOR BYTES)
+def _cache_key(text: str) -> str:
+    return hashlib.sha256(f"{EMBEDDING_MODEL}:{text}".encode("utf-8")).hexdigest()
+
+
+def embed_with_cache(chunks: List[str], cache_path: Path) -> np.ndarray:
+    """
+    Embed chunks, only sending cache misses to the embedding API.
+
+    Vectors are stored in a SQLite table keyed by the hash of the embedding
+    model name and chunk text, so rebuilding after small edits to the
+    knowledge base only re-embeds the chunks that changed.
+    """
+    keys = [_cache_key(c) for c in chunks]
+
+    # closing() closes the connection; the inner `with conn` commits the inserts
+    with closing(sqlite3.connect(cache_path)) as conn, conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vec BLOB)")
+
+        cached = {}
+        for key in set(keys):
+            row = conn.execute("SELECT vec FROM embeddings WHERE hash = ?", (key,)).fetchone()
+            if row is not None:
+                cached[key] = np.frombuffer(row[0], dtype=np.float32)
+
+        miss_idx = [i for i, key in enumerate(keys) if key not in cached]
+        print(f"Embedding cache: {len(chunks) - len(miss_idx)} hits, {len(miss_idx)} misses")
+
+        if miss_idx:
+            miss_arr = asyncio.run(embed_texts([chunks[i] for i in miss_idx]))
+            if miss_arr.ndim != 2 or len(miss_arr) != len(miss_idx):
+                raise RuntimeError(
+                    f"embedding failed for {len(miss_idx)} uncached chunks "
+                    f"(got shape {miss_arr.shape})"
+                )
+
+            new_rows = {}
+            for i, vec in zip(miss_idx, miss_arr):
+                cached[keys[i]] = vec
+                new_rows[keys[i]] = vec.tobytes()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                new_rows.items(),
+            )
+
+    # Splice hits and fresh embeddings back together in chunk order
+    return np.vstack([cached[key] for key in keys]).astype(np.float32, copy=False)
 
 #ONE TIME INDEX BUILDING SCRIPT (KNOWLEDGE BASE TO VECTOR STORE)
 def main() -> None:
@@ -58,7 +114,7 @@ def main() -> None:
     # EMBEDDING ALL CHUNKS
     print(f"Generating embeddings for {len(chunks)} chunks...")
     try:
-        emb_arr = embed_texts(chunks) #embeddings.py function call
+        emb_arr = embed_with_cache(chunks, embeddings_dir / "embed_cache.sqlite")
     except Exception as e:
         print(f"ERROR generating embeddings: {e}")
         print("\nPossible issues:")
@@ -90,22 +146,41 @@ def main() -> None:
     if n != len(chunks):
         print(f"WARNING: Number of embeddings ({n}) doesn't match chunks ({len(chunks)})")
 
-    # Build FAISS index (L2) SEMANTIC SEARCH (EUCLIDEAN DISTANCE)
-    print("Building FAISS IndexFlatL2...")
-    index = faiss.IndexFlatL2(d)
+    # Build FAISS index (HNSW graph, IP) SEMANTIC SEARCH (COSINE SIMILARITY ON NORMALIZED VECTORS)
+    # Vectors are stored as int8 codes (SQ8): 4x less memory than float32, queries stay float32
+    print("Building FAISS IndexHNSWSQ (8-bit)...")
+    index = faiss.IndexHNSWSQ(
+        d, faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT
+    )  # M=32 neighbours per node
+    index.hnsw.efConstruction = 200
+    index.train(emb_arr)  # Learns per-dimension ranges for the quantizer
     index.add(emb_arr)
 
     index_file = embeddings_dir / "faiss_index.bin" #SAVING INDEX (CHUNK_ID:VECTOR MAPPING) VECTOR DATABASE
-    metadata_file = embeddings_dir / "metadata.pkl" #SAVING CHUNKS (CHUNK_ID:TEXT MAPPING)  CHUNK TEXT DATABASE
+    metadata_file = embeddings_dir / "metadata.npz" #SAVING CHUNKS (CHUNK_ID:TEXT MAPPING)  CHUNK TEXT DATABASE
 
     #SAVING INDEX (CHUNK_ID:VECTOR MAPPING)
+    # Written to a temp file then swapped in with os.replace: running workers keep their
+    # mapping of the old file, whereas rewriting it in place could SIGBUS them
     print(f"Saving FAISS index to {index_file}...")
-    faiss.write_index(index, str(index_file))
+    tmp_index_file = index_file.with_name(index_file.name + ".tmp")
+    faiss.write_index(index, str(tmp_index_file))
+    os.replace(tmp_index_file, index_file)
 
     #SAVING CHUNKS (CHUNK_ID:TEXT MAPPING)
     print(f"Saving metadata (chunks) to {metadata_file}...")
-    with open(metadata_file, "wb") as f:
-        pickle.dump(chunks, f)
+    # Chunk i is buf[off[i]:off[i + 1]] (one allocation to load instead of one str per chunk)
+    encoded = [c.encode("utf-8") for c in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    tmp_metadata_file = metadata_file.with_name(metadata_file.name + ".tmp")
+    with open(tmp_metadata_file, "wb") as f:  # File object: savez won't append ".npz"
+        np.savez(
+            f,
+            buf=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            off=offsets,
+        )
+    os.replace(tmp_metadata_file, metadata_file)
 
     print("\n✓ Index build complete!")
     print(f"  - Index: {index_file}")